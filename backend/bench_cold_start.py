@@ -0,0 +1,69 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import json
+
+# Measures cold start -> first successful /health and the server's resident memory.
+# Usage: python bench_cold_start.py [runs]   (set EAGER_IMPORTS=1 to compare eager mode)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mb(pid: int) -> float:
+    # Linux only; good enough for the Render free tier
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return float("nan")
+
+def run_once() -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("Server exited before becoming healthy")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    body = json.load(resp)
+                break
+            except OSError:
+                time.sleep(0.02)
+        return {
+            "first_health_ms": round((time.perf_counter() - started) * 1000, 1),
+            "rss_mb": round(rss_mb(proc.pid), 1),
+            "boot": body.get("boot", {}).get("timings_ms", {}),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    results = [run_once() for _ in range(runs)]
+    for i, r in enumerate(results, 1):
+        print(f"run {i}: first /health {r['first_health_ms']} ms, RSS {r['rss_mb']} MB, boot {r['boot']}")
+
+    latencies = sorted(r["first_health_ms"] for r in results)
+    print(f"\nEAGER_IMPORTS={os.getenv('EAGER_IMPORTS', '0')}")
+    print(f"median first /health: {latencies[len(latencies) // 2]} ms")
+    print(f"max RSS: {max(r['rss_mb'] for r in results)} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+SUBSCRIBER_QUEUE_SIZE = 64
+LIKE_FLUSH_INTERVAL = 1.0  # seconds; likes are batched into one event per interval
+
+class Subscriber:
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+class ForumBroker:
+    """In-process pub/sub for forum events, fanned out to SSE subscribers"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, like_interval: float = LIKE_FLUSH_INTERVAL):
+        self.queue_size = queue_size
+        self.like_interval = like_interval
+        self._subscribers: Set[Subscriber] = set()
+        self._pending_likes: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._next_id = 0
+
+    # --- Subscribers ---
+
+    def subscribe(self) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "pending_likes": len(self._pending_likes),
+        }
+
+    # --- Publishing (called from ForumManager) ---
+
+    def publish(self, event: str, data: dict):
+        self._call_in_loop(self._dispatch, event, data)
+
+    def publish_like(self, post_id: str, likes: int):
+        self._call_in_loop(self._queue_like, post_id, likes)
+
+    def _call_in_loop(self, fn, *args):
+        # Nobody has subscribed yet, so there is nobody to tell
+        if self._loop is None or self._loop.is_closed() or not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            fn(*args)
+        else:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def _queue_like(self, post_id: str, likes: int):
+        # Only the latest count per post matters
+        self._pending_likes[post_id] = likes
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.like_interval, self._flush_likes)
+
+    def _flush_likes(self):
+        self._flush_handle = None
+        if self._pending_likes:
+            likes, self._pending_likes = self._pending_likes, {}
+            self._dispatch("likes", likes)
+
+    def _dispatch(self, event: str, data: dict):
+        self._next_id += 1
+        message = format_sse(self._next_id, event, data)
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and tell it to refetch once instead
+                subscriber.dropped += subscriber.queue.qsize()
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(format_sse(self._next_id, "resync", {"dropped": subscriber.dropped}))
+
+def format_sse(event_id: int, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
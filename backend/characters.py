@@ -0,0 +1,29 @@
+import hashlib
+import re
+
+DESCRIPTOR_LIMIT = 120  # characters per descriptor in panel prompts
+
+def normalize_name(name: str) -> str:
+    return name.lower().strip()
+
+def source_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+def build_descriptor(text: str, limit: int = DESCRIPTOR_LIMIT) -> str:
+    """Condense a free-text appearance into a short comma-separated tag list for SDXL"""
+    phrases = []
+    seen = set()
+    length = 0
+    # Drop trailing "(personality)" notes the frontend appends, they don't render anyway
+    text = re.sub(r"\([^)]*\)\s*$", "", text)
+    for phrase in re.split(r"[.,;\n]+", text):
+        phrase = " ".join(phrase.split())
+        key = phrase.lower()
+        if not phrase or key in seen:
+            continue
+        if length + len(phrase) > limit and phrases:
+            break
+        phrases.append(phrase[:limit])
+        seen.add(key)
+        length += len(phrase) + 2
+    return ", ".join(phrases)
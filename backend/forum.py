@@ -1,16 +1,26 @@
 import json
 import os
+import time
 import uuid
 from datetime import datetime
+from email.utils import formatdate
 from typing import List, Optional, Dict
 from models import ForumPost, ForumComment, CreatePostRequest
+from search import SearchIndex
+from broker import ForumBroker
 
 FORUM_FILE = "forum.json"
 
 class ForumManager:
-    def __init__(self):
+    def __init__(self, search_index: Optional[SearchIndex] = None, broker: Optional[ForumBroker] = None):
         self.file_path = FORUM_FILE
+        self.search_index = search_index
+        self.broker = broker
         self._ensure_file()
+        # Bumped on every write; backs the ETag/Last-Modified of list endpoints
+        self._instance = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._last_modified = os.path.getmtime(self.file_path)
 
     def _ensure_file(self):
         if not os.path.exists(self.file_path):
@@ -27,6 +37,16 @@ class ForumManager:
     def _save_data(self, data: dict):
         with open(self.file_path, 'w') as f:
             json.dump(data, f, indent=2)
+        self._version += 1
+        self._last_modified = time.time()
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._instance}-{self._version}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self._last_modified, usegmt=True)
 
     def create_post(self, request: CreatePostRequest) -> ForumPost:
         data = self._load_data()
@@ -45,6 +65,10 @@ class ForumManager:
         
         data["posts"][post_id] = new_post.model_dump()
         self._save_data(data)
+        if self.search_index:
+            self.search_index.index_post(data["posts"][post_id])
+        if self.broker:
+            self.broker.publish("post", data["posts"][post_id])
         return new_post
 
     def get_posts(self) -> List[ForumPost]:
@@ -84,6 +108,10 @@ class ForumManager:
              
         data["posts"][post_id]["comments"].append(comment.model_dump())
         self._save_data(data)
+        if self.search_index:
+            self.search_index.index_post(data["posts"][post_id])
+        if self.broker:
+            self.broker.publish("comment", comment.model_dump())
         return comment
 
     def like_post(self, post_id: str) -> Optional[int]:
@@ -96,4 +124,13 @@ class ForumManager:
             
         data["posts"][post_id]["likes"] += 1
         self._save_data(data)
+        if self.broker:
+            self.broker.publish_like(post_id, data["posts"][post_id]["likes"])
         return data["posts"][post_id]["likes"]
+
+    def reindex(self):
+        """Push every stored post into the search index (used to seed an empty index)"""
+        if not self.search_index:
+            return
+        for post_id, pdata in self._load_data()["posts"].items():
+            self.search_index.index_post({"id": post_id, **pdata})
@@ -0,0 +1,124 @@
+import json
+import re
+from typing import Any, List, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+def strip_fences(text: str) -> str:
+    """Remove markdown code blocks from JSON string"""
+    cleaned = re.sub(r"```json\s*", "", text)
+    cleaned = re.sub(r"```\s*", "", cleaned)
+    return cleaned.strip()
+
+def repair_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse LLM JSON output, tolerating code fences, stray prose around the object,
+    trailing commas and truncation. Returns (data, truncated); when truncated, the
+    incomplete trailing element is dropped and every open container is closed.
+    """
+    cleaned = strip_fences(text)
+    try:
+        return json.loads(cleaned, strict=False), False
+    except json.JSONDecodeError:
+        pass
+
+    # Prose may contain brackets before the real object, so try each candidate start in turn.
+    # Starts inside a span an earlier candidate already scanned are skipped: a nested panel
+    # must never be returned in place of the document around it.
+    error: ValueError = ValueError("No JSON object found in model response")
+    resume = 0
+    for start, ch in enumerate(cleaned):
+        if start < resume or ch not in "{[":
+            continue
+        try:
+            return _scan(cleaned, start)
+        except _ScanError as e:
+            error = e
+            resume = e.end
+    raise error
+
+class _ScanError(ValueError):
+    def __init__(self, message: str, end: int):
+        super().__init__(message)
+        self.end = end
+
+def _scan(cleaned: str, start: int) -> Tuple[Any, bool]:
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    # Points where everything emitted so far is a sequence of complete values
+    cuts: List[Tuple[int, List[str]]] = []
+
+    i = start
+    n = len(cleaned)
+    while i < n:
+        ch = cleaned[i]
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                break  # Unbalanced closer: treat the rest as garbage
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                # Complete top-level value; anything after it is prose
+                try:
+                    return json.loads("".join(out), strict=False), False
+                except json.JSONDecodeError as e:
+                    # Malformed inside (missing comma, unescaped quote): keep what precedes the error
+                    return _close(out, cuts, e.pos, i + 1)
+            cuts.append((len(out), list(stack)))
+        elif ch == ",":
+            j = i + 1
+            while j < n and cleaned[j].isspace():
+                j += 1
+            if j < n and cleaned[j] in "}]":
+                i += 1  # Trailing comma
+                continue
+            cuts.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+
+    return _close(out, cuts, len(out), i)
+
+def _close(out: List[str], cuts: List[Tuple[int, List[str]]], limit: int, end: int) -> Tuple[Any, bool]:
+    """Cut at the last complete element before limit and close every open container"""
+    for length, open_stack in reversed(cuts):
+        if length > limit:
+            continue
+        repaired = "".join(out[:length]) + "".join(reversed(open_stack))
+        try:
+            return json.loads(repaired, strict=False), True
+        except json.JSONDecodeError as e:
+            limit = min(limit, e.pos)
+    raise _ScanError("Model response was cut off before any complete value", end)
+
+def salvage(items: Any, model: Type[T]) -> List[T]:
+    """Validate list items one by one, keeping every complete one"""
+    if not isinstance(items, list):
+        return []
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            valid.append(model(**item))
+        except (ValidationError, TypeError):
+            continue
+    return valid
@@ -1,16 +1,30 @@
 import json
 import os
+import time
+import random
 import uuid
 from datetime import datetime
+from email.utils import formatdate
 from typing import List, Dict, Optional
-from models import Project, ProjectSummary, ScriptResponse, Panel, CharacterProfile
+from models import Project, ProjectSummary, ScriptResponse, Panel, CharacterProfile, CharacterAsset
+from characters import normalize_name, source_hash, build_descriptor
+from search import SearchIndex
 
 PROJECTS_FILE = "projects.json"
+MAX_SEED = 2**32 - 1
+
+def new_seed() -> int:
+    return random.randint(0, MAX_SEED)
 
 class ProjectManager:
-    def __init__(self):
+    def __init__(self, search_index: Optional[SearchIndex] = None):
         self.file_path = PROJECTS_FILE
+        self.search_index = search_index
         self._ensure_file()
+        # Bumped on every write; backs the ETag/Last-Modified of list endpoints
+        self._instance = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._last_modified = os.path.getmtime(self.file_path)
 
     def _ensure_file(self):
         if not os.path.exists(self.file_path):
@@ -27,6 +41,16 @@ class ProjectManager:
     def _save_data(self, data: Dict[str, dict]):
         with open(self.file_path, 'w') as f:
             json.dump(data, f, indent=2)
+        self._version += 1
+        self._last_modified = time.time()
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._instance}-{self._version}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self._last_modified, usegmt=True)
 
     def save_project(self, project: Project) -> str:
         data = self._load_data()
@@ -38,9 +62,21 @@ class ProjectManager:
         
         project.updated_at = datetime.now().isoformat()
         
+        # Seeds are managed server-side; keep them when the client saves without them
+        existing = data.get(project.id, {})
+        if project.seed is None:
+            project.seed = existing.get("seed")
+        if project.seed is None:
+            project.seed = new_seed()
+        project.panel_seeds = {**existing.get("panel_seeds", {}), **project.panel_seeds}
+        stored_assets = {k: CharacterAsset(**v) for k, v in existing.get("character_assets", {}).items()}
+        project.character_assets = {**stored_assets, **project.character_assets}
+        
         # Convert Pydantic to dict
         data[project.id] = project.model_dump()
         self._save_data(data)
+        if self.search_index:
+            self.search_index.index_project(data[project.id])
         return project.id
 
     def get_project(self, project_id: str) -> Optional[Project]:
@@ -79,10 +115,103 @@ class ProjectManager:
         summaries.sort(key=lambda x: x.updated_at, reverse=True)
         return summaries
 
+    def get_seed(self, project_id: str, panel_id: Optional[int] = None, new_variant: bool = False) -> Optional[int]:
+        """Seed for a panel (or the project when panel_id is None). Rolls and stores a new one for variants."""
+        data = self._load_data()
+        pdata = data.get(project_id)
+        if not pdata:
+            return None
+
+        seeds = pdata.setdefault("panel_seeds", {})
+        key = str(panel_id) if panel_id is not None else None
+
+        if new_variant and key is not None:
+            seeds[key] = new_seed()
+            self._save_data(data)
+            return seeds[key]
+        if key in seeds:
+            return seeds[key]
+        if pdata.get("seed") is None:
+            pdata["seed"] = new_seed()
+            self._save_data(data)
+        return pdata["seed"]
+
+    def get_character_descriptors(self, project_id: str, profiles: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Compact per-character descriptors for a project, built once and rebuilt only when a profile changes"""
+        data = self._load_data()
+        pdata = data.get(project_id)
+        if not pdata:
+            return {}
+
+        # Profiles sent with the request are the client's current (possibly unsaved) edits;
+        # the saved script is only the fallback
+        sources = dict(profiles or {})
+        if not sources:
+            for character in (pdata.get("script") or {}).get("characters") or []:
+                sources[character["name"]] = character.get("appearance") or character.get("description", "")
+
+        assets = pdata.setdefault("character_assets", {})
+        changed = False
+        for name, text in sources.items():
+            key = normalize_name(name)
+            digest = source_hash(text)
+            asset = assets.get(key)
+            if asset and asset["source_hash"] == digest:
+                continue
+            assets[key] = CharacterAsset(
+                name=name,
+                descriptor=build_descriptor(text),
+                source_hash=digest,
+                sheet_url=asset.get("sheet_url") if asset else None,
+                sheet_seed=asset.get("sheet_seed") if asset else None,
+            ).model_dump()
+            changed = True
+
+        if changed:
+            self._save_data(data)
+        # Only the current cast; assets of removed characters stay stored but stay out of prompts
+        current = [assets[normalize_name(name)] for name in sources]
+        return {asset["name"]: asset["descriptor"] for asset in current}
+
+    def save_character_sheet(self, project_id: str, name: str, description: str, sheet_url: str, seed: Optional[int]) -> Optional[CharacterAsset]:
+        data = self._load_data()
+        pdata = data.get(project_id)
+        if not pdata:
+            return None
+
+        assets = pdata.setdefault("character_assets", {})
+        key = normalize_name(name)
+        if key not in assets:
+            assets[key] = CharacterAsset(
+                name=name,
+                descriptor=build_descriptor(description),
+                source_hash=source_hash(description),
+            ).model_dump()
+        assets[key]["sheet_url"] = sheet_url
+        assets[key]["sheet_seed"] = seed
+        self._save_data(data)
+        return CharacterAsset(**assets[key])
+
+    def get_character_assets(self, project_id: str) -> Optional[List[CharacterAsset]]:
+        data = self._load_data()
+        pdata = data.get(project_id)
+        if pdata is None:
+            return None
+        return [CharacterAsset(**a) for a in pdata.get("character_assets", {}).values()]
+
     def delete_project(self, project_id: str) -> bool:
         data = self._load_data()
         if project_id in data:
             del data[project_id]
             self._save_data(data)
+            if self.search_index:
+                self.search_index.remove_project(project_id)
             return True
         return False
+
+    def reindex(self):
+        """Push every stored project into the search index (used to seed an empty index)"""
+        if not self.search_index:
+            return
+        for pid, pdata in self._load_data().items():
+            self.search_index.index_project({"id": pid, **pdata})
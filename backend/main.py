@@ -1,26 +1,66 @@
-from fastapi import FastAPI, HTTPException, Header
+import startup
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from models import StoryRequest, ScriptResponse, CharacterSheetResponse, EnhanceRequest, EnhanceResponse, ImageRequest, ImageResponse, Project, ProjectSummary, CreatePostRequest, CreateCommentRequest, ForumPost, ForumComment, ReferenceSheetRequest
-from services import script_generator
-from library import ProjectManager
+from fastapi.responses import StreamingResponse
+from models import StoryRequest, ScriptResponse, CharacterSheetResponse, EnhanceRequest, EnhanceResponse, ImageRequest, ImageResponse, Project, ProjectSummary, CreatePostRequest, CreateCommentRequest, ForumPost, ForumComment, ReferenceSheetRequest, SearchResponse, StyleInfo, CharacterAsset, FinalizeRequest, FinalizeResponse
+from services import script_generator, is_quota_error
+from workers import image_pool, WorkQueueFull
+from library import ProjectManager, new_seed
 from forum import ForumManager
-from google.api_core.exceptions import ResourceExhausted
+from search import SearchIndex, MAX_COUNT
+from broker import ForumBroker
+from styles import style_registry
 from dotenv import load_dotenv
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import asyncio
 import os
-from typing import List
+from typing import List, Optional
 
 # Load environment variables (HF Token etc)
 load_dotenv()
 
-app = FastAPI(title="Manga Chapter Generator API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.mark("app_started")
+    yield
+    image_pool.shutdown()
+
+app = FastAPI(title="Manga Chapter Generator API", lifespan=lifespan)
 
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize Library
-library = ProjectManager()
-forum = ForumManager()
+# Forum events for /forum/stream; cheap to create, holds no connections until someone subscribes
+forum_broker = ForumBroker()
+SSE_KEEPALIVE_SECONDS = 15
+
+# Storage managers are built on first use so a cold boot only pays for what it serves
+@lru_cache(maxsize=None)
+def get_search_index() -> SearchIndex:
+    search_index = SearchIndex()
+    # Seed the search index from existing data on first boot
+    if search_index.is_empty():
+        ProjectManager(search_index).reindex()
+        ForumManager(search_index).reindex()
+    startup.mark("search_index_ready")
+    return search_index
+
+@lru_cache(maxsize=None)
+def get_library() -> ProjectManager:
+    return ProjectManager(get_search_index())
+
+@lru_cache(maxsize=None)
+def get_forum() -> ForumManager:
+    return ForumManager(get_search_index(), forum_broker)
+
+if startup.EAGER_IMPORTS:
+    startup.preload()
+    get_library()
+    get_forum()
 
 # Configure CORS
 app.add_middleware(
@@ -29,12 +69,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+def _validator_headers(manager) -> dict:
+    return {
+        "ETag": manager.etag,
+        "Last-Modified": manager.last_modified,
+        "Cache-Control": "no-cache",
+    }
+
+def _not_modified(request: Request, manager) -> bool:
+    """Answer conditional GETs from the manager's version counter, without touching the data"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return manager.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(manager.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+startup.mark("app_imported")
 
 @app.get("/health")
 async def health_check():
     print("Health check endpoint called!")
-    return {"status": "ok", "message": "Manga Generator Backend is running"}
+    startup.mark("first_health")
+    return {
+        "status": "ok",
+        "message": "Manga Generator Backend is running",
+        "image_queue": image_pool.stats(),
+        "forum_stream": forum_broker.stats(),
+        "boot": startup.report(),
+    }
 
 @app.get("/auth/validate")
 async def validate_auth(x_gemini_api_key: str = Header(None)):
@@ -70,9 +142,9 @@ async def generate_script(request: StoryRequest, authorization: str = Header(Non
     
     try:
         return await script_generator.generate_script(request.prompt, final_key)
-    except ResourceExhausted as e:
-        raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
     except Exception as e:
+        if is_quota_error(e):
+            raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate/characters", response_model=CharacterSheetResponse)
@@ -86,9 +158,9 @@ async def generate_characters(request: StoryRequest, authorization: str = Header
         
     try:
         return await script_generator.generate_characters(request.prompt, final_key)
-    except ResourceExhausted as e:
-        raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
     except Exception as e:
+        if is_quota_error(e):
+            raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate/image", response_model=ImageResponse)
@@ -100,6 +172,18 @@ async def generate_image(request: ImageRequest, authorization: str = Header(None
     if not final_key:
         raise HTTPException(status_code=401, detail="API Key required")
         
+    seed = request.seed
+    if seed is None and request.project_id:
+        seed = get_library().get_seed(request.project_id, request.panel_id, request.new_variant)
+    # Unsaved project (or none at all): a variant still needs a fresh seed, not the prompt-derived one
+    if seed is None and request.new_variant:
+        seed = new_seed()
+
+    # Use the project's stored character descriptors instead of re-sending full profiles
+    character_profiles = request.character_profiles
+    if request.project_id:
+        character_profiles = get_library().get_character_descriptors(request.project_id, request.character_profiles) or character_profiles
+
     try:
         return await script_generator.generate_image(
             request.panel_id, 
@@ -107,42 +191,76 @@ async def generate_image(request: ImageRequest, authorization: str = Header(None
             request.style, 
             request.art_style,
             final_key,
-            request.character_profiles, # Pass context for consistency
+            character_profiles, # Pass context for consistency
             request.characters, # Pass active characters for strict filtering
-            request.hf_token # Pass User Token
+            request.hf_token, # Pass User Token
+            seed
         )
-    except ResourceExhausted as e:
-        raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
+    except WorkQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
+        if is_quota_error(e):
+            raise HTTPException(status_code=429, detail=f"Quota Exceeded: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/styles", response_model=List[StyleInfo])
+async def list_styles():
+    return style_registry.list_styles()
+
 # --- Forum Endpoints ---
 
 @app.get("/forum/posts", response_model=List[ForumPost])
-async def get_posts():
+async def get_posts(request: Request, response: Response):
+    forum = get_forum()
+    headers = _validator_headers(forum)
+    if _not_modified(request, forum):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return forum.get_posts()
 
 @app.post("/forum/posts", response_model=ForumPost)
 async def create_post(request: CreatePostRequest):
-    return forum.create_post(request)
+    return get_forum().create_post(request)
+
+@app.get("/forum/stream")
+async def forum_stream(request: Request):
+    """Server-sent events for new posts, comments and (batched) like counts"""
+    subscriber = forum_broker.subscribe()
+
+    async def events():
+        try:
+            yield f"retry: {SSE_KEEPALIVE_SECONDS * 1000}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            forum_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/forum/posts/{post_id}", response_model=ForumPost)
 async def get_post(post_id: str):
-    post = forum.get_post(post_id)
+    post = get_forum().get_post(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
 
 @app.post("/forum/posts/{post_id}/comments", response_model=ForumComment)
 async def add_comment(post_id: str, request: CreateCommentRequest):
-    comment = forum.add_comment(post_id, request.content, request.author)
+    comment = get_forum().add_comment(post_id, request.content, request.author)
     if not comment:
         raise HTTPException(status_code=404, detail="Post not found")
     return comment
 
 @app.post("/forum/posts/{post_id}/like")
 async def like_post(post_id: str):
-    likes = forum.like_post(post_id)
+    likes = get_forum().like_post(post_id)
     if likes is None:
         raise HTTPException(status_code=404, detail="Post not found")
     return {"likes": likes}
@@ -158,18 +276,30 @@ async def generate_character_sheet(request: ReferenceSheetRequest, authorization
     if not final_key:
         raise HTTPException(status_code=401, detail="API Key required")
         
+    seed = request.seed
+    if seed is None and request.project_id:
+        seed = get_library().get_seed(request.project_id)
+
     try:
-        # Use a consistent panel ID for character sheets, or random
-        import random
-        panel_id = random.randint(10000, 99999) 
-        
-        return await script_generator.generate_character_sheet(
+        result = await script_generator.generate_character_sheet(
             request.character_name,
             request.character_description,
             request.art_style,
             final_key,
-            request.features
+            request.features,
+            seed
         )
+        if request.project_id and result.status == "completed":
+            get_library().save_character_sheet(
+                request.project_id,
+                request.character_name,
+                request.character_description,
+                result.image_url,
+                result.seed
+            )
+        return result
+    except WorkQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -178,32 +308,118 @@ async def generate_character_sheet(request: ReferenceSheetRequest, authorization
 @app.post("/projects", response_model=str)
 async def save_project(project: Project):
     try:
-        project_id = library.save_project(project)
+        project_id = get_library().save_project(project)
         return project_id
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save project: {str(e)}")
 
 @app.get("/projects", response_model=List[ProjectSummary])
-async def list_projects():
+async def list_projects(request: Request, response: Response):
+    library = get_library()
+    headers = _validator_headers(library)
+    if _not_modified(request, library):
+        return Response(status_code=304, headers=headers)
     try:
+        response.headers.update(headers)
         return library.get_all_projects()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list projects: {str(e)}")
 
 @app.get("/projects/{project_id}", response_model=Project)
 async def get_project(project_id: str):
-    project = library.get_project(project_id)
+    project = get_library().get_project(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@app.get("/projects/{project_id}/characters", response_model=List[CharacterAsset])
+async def get_character_assets(project_id: str):
+    assets = get_library().get_character_assets(project_id)
+    if assets is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return assets
+
+@app.post("/projects/{project_id}/finalize", response_model=FinalizeResponse)
+async def finalize_project(project_id: str, request: FinalizeRequest, authorization: str = Header(None), x_gemini_api_key: str = Header(None)):
+    final_key = x_gemini_api_key
+    if not final_key and authorization and authorization.startswith("Bearer "):
+        final_key = authorization.replace("Bearer ", "")
+
+    if not final_key:
+        raise HTTPException(status_code=401, detail="API Key required")
+
+    library = get_library()
+    # Previews made without project_id were prompted with the full profiles; reuse them so the
+    # final render matches. Otherwise build descriptors before loading the project so the save
+    # below doesn't write back stale assets.
+    character_profiles = request.character_profiles or library.get_character_descriptors(project_id)
+    project = library.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    keep = set(request.panel_ids)
+    results = []
+    try:
+        # Sequential on purpose: each panel is a paid SDXL call and shares the image queue
+        for panel in project.script.panels:
+            if panel.id not in keep:
+                continue
+            # Previews rendered without project_id used a prompt-derived seed, so take the one the
+            # client kept; otherwise it's the project seed the preview also used
+            seed = request.seeds.get(panel.id)
+            if seed is None:
+                seed = library.get_seed(project_id, panel.id)
+            else:
+                project.panel_seeds[str(panel.id)] = seed
+            result = await script_generator.generate_image(
+                panel.id,
+                panel.description,
+                "final",
+                project.art_style,
+                final_key,
+                character_profiles,
+                panel.characters,
+                request.hf_token,
+                seed
+            )
+            if result.status == "completed":
+                project.images[str(panel.id)] = result.image_url
+            results.append(result)
+    except WorkQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    finally:
+        # Keep whatever was upgraded even if a later panel failed
+        if results:
+            library.save_project(project)
+
+    return FinalizeResponse(project_id=project_id, results=results)
+
 @app.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
-    success = library.delete_project(project_id)
+    success = get_library().delete_project(project_id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"status": "deleted"}
 
+# --- Search ---
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    q: str,
+    kind: Optional[str] = Query(None, pattern="^(project|post)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    total, results = get_search_index().search(q, kind, page, page_size)
+    return SearchResponse(
+        query=q,
+        total=total,
+        total_capped=total >= MAX_COUNT,
+        page=page,
+        page_size=page_size,
+        results=results,
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Manga Chapter Generator API"}
@@ -37,10 +37,13 @@ class ImageRequest(BaseModel):
     panel_id: int
     description: str
     characters: List[str]
-    style: str
+    style: str # Quality tier: "preview" or "final"
     art_style: Optional[str] = "manga"
     character_profiles: Optional[Dict[str, str]] = None 
     hf_token: Optional[str] = None # User Provided Token
+    project_id: Optional[str] = None # Use the project's stored seeds
+    seed: Optional[int] = None # Explicit seed, overrides project seeds
+    new_variant: bool = False # Roll a fresh seed for this panel (one upstream call)
 
 class ImageResponse(BaseModel):
     panel_id: int
@@ -50,8 +53,35 @@ class ImageResponse(BaseModel):
     rate_limit_remaining: Optional[int] = None
     rate_limit_reset: Optional[int] = None
     rate_limit_total: Optional[int] = None
+    # Reproducibility
+    seed: Optional[int] = None
+    quality: Optional[str] = None
+    cached: bool = False
+
+class FinalizeRequest(BaseModel):
+    panel_ids: List[int] # Panels the user kept; only these are re-rendered at final quality
+    hf_token: Optional[str] = None
+    seeds: Dict[int, int] = {} # panel_id -> seed the kept preview returned (ImageResponse.seed)
+    character_profiles: Optional[Dict[str, str]] = None # Profiles the previews were rendered with
+
+class FinalizeResponse(BaseModel):
+    project_id: str
+    results: List[ImageResponse]
+
+class StyleInfo(BaseModel):
+    id: str
+    name: str
+    desc: str
+    prompt: str
 
 # --- Library Models ---
+class CharacterAsset(BaseModel):
+    name: str
+    descriptor: str # Compact appearance tags used in panel prompts
+    source_hash: str # Hash of the profile text the descriptor was built from
+    sheet_url: Optional[str] = None # Generated reference sheet
+    sheet_seed: Optional[int] = None
+
 class Project(BaseModel):
     id: str
     title: str
@@ -60,6 +90,9 @@ class Project(BaseModel):
     script: ScriptResponse
     images: Dict[str, str] # panel_id -> image_url
     art_style: str
+    seed: Optional[int] = None # Project-wide seed shared by all panels
+    panel_seeds: Dict[str, int] = {} # panel_id -> seed override (picked variants)
+    character_assets: Dict[str, CharacterAsset] = {} # normalized name -> asset
 
 class ProjectSummary(BaseModel):
     id: str
@@ -101,4 +134,22 @@ class ReferenceSheetRequest(BaseModel):
     character_description: str
     art_style: str = "manga"
     features: List[str] = []
+    project_id: Optional[str] = None
+    seed: Optional[int] = None
+
 
+# --- Search Models ---
+class SearchResult(BaseModel):
+    kind: str  # "project" or "post"
+    id: str
+    title: str
+    snippet: str
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    total_capped: bool = False # True when total stopped counting at the index's cap
+    page: int
+    page_size: int
+    results: List[SearchResult]
@@ -0,0 +1,205 @@
+import re
+import sqlite3
+import threading
+from typing import Optional, Tuple, List
+from models import SearchResult
+
+SEARCH_DB_FILE = "search.db"
+# Bump when the FTS table definition changes; the index is rebuilt from the JSON stores
+SCHEMA_VERSION = 2
+
+# Column weights for bm25(): title, body, names, kind
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 0.0)
+# Prefix queries shorter than this match too much of the index to rank quickly
+MIN_PREFIX_LEN = 2
+# Totals are counted up to this many hits; beyond it clients just get "1000+"
+MAX_COUNT = 1000
+
+class SearchIndex:
+    """Local SQLite FTS5 index over library projects and forum posts"""
+
+    def __init__(self, db_path: str = SEARCH_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # Derived data only: drop it and let main.py reseed the empty index
+                self._conn.execute("DROP TABLE IF EXISTS documents")
+                self._conn.execute("DROP TABLE IF EXISTS doc_keys")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            # doc_keys maps (kind, doc_id) to the FTS rowid so updates never scan the index
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS doc_keys ("
+                " rowid INTEGER PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " doc_id TEXT NOT NULL,"
+                " UNIQUE(kind, doc_id))"
+            )
+            # kind is indexed so the filter is part of MATCH; prefix indexes keep short prefix queries cheap
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5("
+                " title, body, names, kind, updated_at UNINDEXED,"
+                " tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            # Let ORDER BY rank use the weighted bm25 natively
+            self._conn.execute(
+                "INSERT INTO documents (documents, rank) VALUES ('rank', ?)",
+                (f"bm25({', '.join(str(w) for w in RANK_WEIGHTS)})",),
+            )
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM doc_keys LIMIT 1").fetchone()
+        return row is None
+
+    # --- Document builders ---
+
+    def index_project(self, pdata: dict):
+        script = pdata.get("script") or {}
+        title = script.get("title") or pdata.get("title") or "Untitled Story"
+
+        body_parts = []
+        names = []
+        for panel in script.get("panels", []):
+            body_parts.append(panel.get("description") or "")
+            if panel.get("dialogue"):
+                body_parts.append(panel["dialogue"])
+            names.extend(panel.get("characters") or [])
+        for character in script.get("characters") or []:
+            names.append(character.get("name") or "")
+            body_parts.append(character.get("appearance") or "")
+
+        self._upsert(
+            "project",
+            pdata["id"],
+            title,
+            "\n".join(body_parts),
+            " ".join(dict.fromkeys(names)),
+            pdata.get("updated_at", ""),
+        )
+
+    def index_post(self, pdata: dict):
+        body_parts = [pdata.get("content") or ""]
+        names = [pdata.get("author") or ""]
+        for comment in pdata.get("comments") or []:
+            body_parts.append(comment.get("content") or "")
+            names.append(comment.get("author") or "")
+
+        self._upsert(
+            "post",
+            pdata["id"],
+            pdata.get("title") or "",
+            "\n".join(body_parts),
+            " ".join(dict.fromkeys(names)),
+            pdata.get("created_at", ""),
+        )
+
+    def remove_project(self, project_id: str):
+        self._delete("project", project_id)
+
+    def remove_post(self, post_id: str):
+        self._delete("post", post_id)
+
+    # --- Storage ---
+
+    def _upsert(self, kind: str, doc_id: str, title: str, body: str, names: str, updated_at: str):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT rowid FROM doc_keys WHERE kind = ? AND doc_id = ?", (kind, doc_id)
+            ).fetchone()
+            if row:
+                rowid = row[0]
+                self._conn.execute("DELETE FROM documents WHERE rowid = ?", (rowid,))
+            else:
+                rowid = self._conn.execute(
+                    "INSERT INTO doc_keys (kind, doc_id) VALUES (?, ?)", (kind, doc_id)
+                ).lastrowid
+            self._conn.execute(
+                "INSERT INTO documents (rowid, title, body, names, kind, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (rowid, title, body, names, kind, updated_at),
+            )
+
+    def _delete(self, kind: str, doc_id: str):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT rowid FROM doc_keys WHERE kind = ? AND doc_id = ?", (kind, doc_id)
+            ).fetchone()
+            if not row:
+                return
+            self._conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM doc_keys WHERE rowid = ?", (row[0],))
+
+    # --- Querying ---
+
+    def _build_match(self, query: str, kind: Optional[str] = None) -> Optional[str]:
+        """Turn free text into a safe FTS5 expression (quoted terms, prefix match on the last one)"""
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return None
+        quoted = [f'"{t}"' for t in terms]
+        if len(terms[-1]) >= MIN_PREFIX_LEN:
+            quoted[-1] += "*"
+        # Scope user terms to the text columns; kind is indexed only for the filter, so
+        # "post" or "pro" must not match every document of that kind
+        match = f'{{title body names}} : ({" ".join(quoted)})'
+        if kind:
+            match = f'kind : "{kind}" AND {match}'
+        return match
+
+    def search(
+        self,
+        query: str,
+        kind: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20,
+    ) -> Tuple[int, List[SearchResult]]:
+        """Returns (total, results); total is capped at MAX_COUNT"""
+        match = self._build_match(query, kind)
+        if not match:
+            return 0, []
+
+        offset = (max(page, 1) - 1) * page_size
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT count(*) FROM (SELECT 1 FROM documents WHERE documents MATCH ? LIMIT ?)",
+                (match, MAX_COUNT),
+            ).fetchone()[0]
+            # Rank at most MAX_COUNT candidates (newest rowids first) so broad queries stay cheap;
+            # below the cap this is an exact bm25 ranking of every hit
+            ranked = self._conn.execute(
+                "SELECT c.rowid, c.score FROM ("
+                "  SELECT rowid, rank AS score FROM documents WHERE documents MATCH ?"
+                "  ORDER BY rowid DESC LIMIT ?"
+                ") c ORDER BY c.score LIMIT ? OFFSET ?",
+                (match, MAX_COUNT, page_size, offset),
+            ).fetchall()
+            if not ranked:
+                return total, []
+
+            # Snippets and ids only for the page being returned
+            placeholders = ", ".join("?" for _ in ranked)
+            details = {
+                r[0]: r[1:]
+                for r in self._conn.execute(
+                    "SELECT documents.rowid, k.kind, k.doc_id, documents.title,"
+                    " snippet(documents, 1, '[', ']', '...', 12)"
+                    " FROM documents JOIN doc_keys k ON k.rowid = documents.rowid"
+                    f" WHERE documents MATCH ? AND documents.rowid IN ({placeholders})",
+                    [match] + [r[0] for r in ranked],
+                )
+            }
+            rows = [details[rowid] + (score,) for rowid, score in ranked if rowid in details]
+
+        results = [
+            # bm25 is lower-is-better; flip it so clients can sort descending
+            SearchResult(kind=r[0], id=r[1], title=r[2], snippet=r[3], score=-r[4])
+            for r in rows
+        ]
+        return total, results
@@ -1,15 +1,30 @@
-import google.generativeai as genai
 from models import ScriptResponse, Panel, CharacterSheetResponse, CharacterProfile, ImageResponse
-import json
 import asyncio
 import base64
+import hashlib
 import os
-import re
-import httpx
-from huggingface_hub import AsyncInferenceClient
+import sys
 from typing import Dict, Optional, List
-from PIL import Image
-import io
+import zlib
+from workers import image_pool, save_png, WorkQueueFull
+from styles import style_registry
+from startup import lazy_import
+from json_repair import repair_json, salvage
+
+IMAGE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
+
+# Generation parameters per quality tier (ImageRequest.style). Final keeps the SDXL defaults;
+# preview renders a quarter of the pixels in well under half the steps for storyboarding.
+QUALITY_TIERS = {
+    "preview": {"width": 512, "height": 512, "num_inference_steps": 12},
+    "final": {},
+}
+DEFAULT_QUALITY = "final"
+
+def is_quota_error(e: Exception) -> bool:
+    """True for Gemini ResourceExhausted without importing the Google SDK just to check"""
+    exceptions = sys.modules.get("google.api_core.exceptions")
+    return exceptions is not None and isinstance(e, exceptions.ResourceExhausted)
 
 class ScriptGenerator:
     def __init__(self):
@@ -28,7 +43,7 @@ class ScriptGenerator:
             # 2. Authoritative Check (List Models)
             print(f"Validating key via list_models()...")
             # Run in thread to prevent blocking
-            models = await asyncio.to_thread(list, genai.list_models())
+            models = await asyncio.to_thread(list, self._genai().list_models())
             available_names = [m.name for m in models]
             print(f"Validation successful! Found models: {available_names}")
             
@@ -40,20 +55,40 @@ class ScriptGenerator:
             print(f"Validation failed during API call: {e}")
             return False
 
+    def _genai(self):
+        # google.generativeai is the slowest import in the app, so load it on first use
+        return lazy_import("google.generativeai")
+
     def _configure_genai(self, api_key: str):
-        genai.configure(api_key=api_key)
+        self._genai().configure(api_key=api_key)
 
-    def _clean_json(self, text: str) -> str:
-        """Remove markdown code blocks from JSON string"""
-        cleaned = re.sub(r"```json\s*", "", text)
-        cleaned = re.sub(r"```\s*", "", cleaned)
-        return cleaned.strip()
+    async def _continue_json(self, model, request: str, known: str, shape: str) -> dict:
+        """
+        Ask Gemini for only the missing tail of a cut-off response instead of regenerating it all.
+        Best effort: on any failure returns {} so the caller keeps what it already salvaged.
+        """
+        system_prompt = f"""
+        Your previous JSON response was cut off. Do NOT repeat anything already written.
+        {request}
+        Already written: {known}
+        Return ONLY valid JSON shaped like {shape}, containing just the missing items.
+        """
+        try:
+            response = await model.generate_content_async(
+                contents=[system_prompt],
+                generation_config={"response_mime_type": "application/json"}
+            )
+            data, _ = repair_json(response.text)
+        except Exception as e:
+            print(f"Continuation failed, returning partial result: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
 
     async def generate_script(self, prompt: str, api_key: str) -> ScriptResponse:
         """Generate a manga script using Gemini Pro"""
         self._configure_genai(api_key)
         # Using gemini-2.5-flash
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = self._genai().GenerativeModel('gemini-2.5-flash')
         
         system_prompt = """
         You are an expert manga story writer. Create a structured manga script based on the user's prompt.
@@ -81,9 +116,33 @@ class ScriptGenerator:
                 generation_config={"response_mime_type": "application/json"}
             )
             
-            cleaned_json = self._clean_json(response.text)
-            data = json.loads(cleaned_json)
-            return ScriptResponse(**data)
+            data, truncated = repair_json(response.text)
+            data = data if isinstance(data, dict) else {}
+            panels = salvage(data.get("panels"), Panel)
+            characters = salvage(data.get("characters"), CharacterProfile)
+            if not panels:
+                raise ValueError("Model response contained no complete panels")
+
+            if truncated:
+                print(f"Script response truncated after {len(panels)} panels, requesting the rest")
+                last = panels[-1]
+                tail = await self._continue_json(
+                    model,
+                    f"Continue the manga script for the story idea '{prompt}' from panel {last.id + 1} to its ending, "
+                    f"and list any characters not yet described.",
+                    f"title '{data.get('title', '')}', panels 1-{last.id} (last: {last.description}), "
+                    f"characters {[c.name for c in characters]}",
+                    '{"panels": [{"id", "description", "dialogue", "characters"}], "characters": [{"name", "description", "personality", "appearance"}]}'
+                )
+                known_names = {c.name for c in characters}
+                panels += [p for p in salvage(tail.get("panels"), Panel) if p.id > last.id]
+                characters += [c for c in salvage(tail.get("characters"), CharacterProfile) if c.name not in known_names]
+
+            return ScriptResponse(
+                title=data.get("title") or "Untitled Story",
+                panels=panels,
+                characters=characters
+            )
         except Exception as e:
             print(f"Error generating script: {e}")
             raise e
@@ -92,7 +151,7 @@ class ScriptGenerator:
         """Generate character sheets using Gemini Pro"""
         self._configure_genai(api_key)
         # Using gemini-2.5-flash
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = self._genai().GenerativeModel('gemini-2.5-flash')
         
         system_prompt = """
         Create detailed character profiles for a manga based on this story idea.
@@ -120,9 +179,24 @@ class ScriptGenerator:
                 generation_config={"response_mime_type": "application/json"}
             )
             
-            cleaned_json = self._clean_json(response.text)
-            data = json.loads(cleaned_json)
-            return CharacterSheetResponse(**data)
+            data, truncated = repair_json(response.text)
+            data = data if isinstance(data, dict) else {}
+            characters = salvage(data.get("characters"), CharacterProfile)
+
+            if truncated:
+                print(f"Character response truncated after {len(characters)} profiles, requesting the rest")
+                tail = await self._continue_json(
+                    model,
+                    f"Finish the remaining visually distinct character profiles for the story idea '{prompt}'.",
+                    f"characters {[c.name for c in characters]}",
+                    '{"characters": [{"name", "description", "personality", "appearance"}]}'
+                )
+                known_names = {c.name for c in characters}
+                characters += [c for c in salvage(tail.get("characters"), CharacterProfile) if c.name not in known_names]
+
+            if not characters:
+                raise ValueError("Model response contained no complete character profiles")
+            return CharacterSheetResponse(characters=characters)
         except Exception as e:
             print(f"Error generating characters: {e}")
             raise e
@@ -131,7 +205,7 @@ class ScriptGenerator:
         """Enhance a simple story idea into a detailed prompt"""
         self._configure_genai(api_key)
         # Using gemini-2.5-flash
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = self._genai().GenerativeModel('gemini-2.5-flash')
         
         system_prompt = """
         You are an expert manga editor. Take the user's simple story idea and expand it into a compelling, 
@@ -153,28 +227,28 @@ class ScriptGenerator:
         description: str,
         art_style: str,
         api_key: str,
-        features: List[str] = []
+        features: List[str] = [],
+        seed: Optional[int] = None
     ) -> ImageResponse:
         """Generate a detailed character reference sheet image"""
         
-        # 1. Reuse generate_image logic but with specific prompt
-        # We simulate a "panel_id" for the filename
-        panel_id = 99999 
+        # Stable per-character id so sheets for different characters never share a name
+        panel_id = 10000 + zlib.crc32(name.lower().encode()) % 90000
         
         feature_str = ", ".join(features) if features else "front view, side view, close up"
         
-        prompt = f"Character Reference Sheet for {name}. {description}. {feature_str}. Character design, concept art, {art_style} style, white background, high quality, consistent character details"
-        
-        # We can reuse generate_image but we need to bypass some params or just call the HF API directly to avoid 'panel' specific logic constraints if any.
-        # However, generate_image is generic enough. Let's call it with specific params.
+        prompt = style_registry.build_prompt(
+            "character_sheet", art_style,
+            name=name, description=description, features=feature_str
+        )
         
-        return await self.generate_image(
+        return await self._render_image(
             panel_id=panel_id,
-            description=prompt,
-            style="character_sheet", # Internal style marker
-            art_style=art_style,
-            api_key=api_key,
-            hf_token=None # Use server token by default or passed one if we updated method signature
+            image_prompt=prompt,
+            seed=seed,
+            file_prefix=f"sheet_{panel_id}",
+            quality=DEFAULT_QUALITY,
+            hf_token=None # Use server token by default
         )
 
 
@@ -187,34 +261,11 @@ class ScriptGenerator:
         api_key: str, 
         character_profiles: Optional[Dict[str, str]] = None,
         panel_characters: Optional[List[str]] = None,
-        hf_token: Optional[str] = None
+        hf_token: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> ImageResponse:
         """Generate panel images using Hugging Face Inference API"""
         
-        # 1. Token Usage Strategy: User > Server > None
-        token = hf_token or os.getenv("HUGGING_FACE_TOKEN")
-        
-        if not token:
-            print("Error: No HF Token provided (User or Server).")
-            return ImageResponse(
-                panel_id=panel_id,
-                image_url="https://via.placeholder.com/400x600?text=Missing+HF+Token",
-                status="failed"
-            )
-
-        # Style Definitions for SDXL
-        style_prompts = {
-            "manga": "manga style, black and white, japanese manga, screentones, ink illustration",
-            "shonen": "shonen manga style, dynamic action, high contrast, impact frames, bold lines",
-            "shojo": "shojo manga style, delicate lines, emotional, flowers, sparkle, soft shading",
-            "seinen": "seinen manga style, gritty, realistic proportions, detailed background, dark atmosphere",
-            "cyberpunk": "cyberpunk manga style, neon accents (monochrome), tech wear, messy wires, futuristic",
-            "watercolor": "watercolor manga style, soft artistic, dreamlike, wet media",
-            "horror": "junji ito style, horror manga, linework, creepypasta, scary, spiral"
-        }
-        
-        selected_style_prompt = style_prompts.get(art_style.lower(), style_prompts["manga"])
-
         # Contextual Prompting Logic
         character_context = ""
         if character_profiles:
@@ -240,22 +291,89 @@ class ScriptGenerator:
             if len(character_context) > 400:
                 character_context = character_context[:400] + "..."
 
-        image_prompt = f"{selected_style_prompt}. {character_context}. {description}, monochromatic, manga page, high quality, masterpiece, 4k"
+        image_prompt = style_registry.build_prompt(
+            "panel", art_style,
+            characters=character_context, description=description
+        )
         
-        print(f"Generating Image for Panel {panel_id} [Token Source: {'User' if hf_token else 'Server'}]")
-        print(f"  > Prompt: {image_prompt}")
+        return await self._render_image(
+            panel_id=panel_id,
+            image_prompt=image_prompt,
+            seed=seed,
+            file_prefix=f"panel_{panel_id}",
+            quality=style,
+            hf_token=hf_token
+        )
+
+    async def _render_image(
+        self,
+        panel_id: int,
+        image_prompt: str,
+        seed: Optional[int],
+        file_prefix: str,
+        quality: str = DEFAULT_QUALITY,
+        hf_token: Optional[str] = None
+    ) -> ImageResponse:
+        """Call the SDXL endpoint with a fully built prompt and store the result"""
         
-        negative_prompt = "color, realistic photo, 3d render, bad anatomy, bad hands, text, watermark, blurry, low quality, extra limbs"
+        negative_prompt = style_registry.negative_prompt
+
+        if quality not in QUALITY_TIERS:
+            quality = DEFAULT_QUALITY
+        tier_params = QUALITY_TIERS[quality]
+        if quality != DEFAULT_QUALITY:
+            file_prefix = f"{file_prefix}_{quality}"
+
+        # No seed given: derive one from the prompt so identical requests stay reproducible
+        if seed is None:
+            seed = zlib.crc32(image_prompt.encode())
+
+        # Everything that affects the pixels goes into the cache key
+        cache_key = hashlib.sha1(
+            f"{IMAGE_MODEL}\n{image_prompt}\n{negative_prompt}\n{seed}\n{sorted(tier_params.items())}".encode()
+        ).hexdigest()[:16]
+        filename = f"{file_prefix}_{cache_key}.png"
+        filepath = os.path.join("static/images", filename)
+        image_url = f"http://localhost:8000/static/images/{filename}"
+
+        if os.path.exists(filepath):
+            print(f"Image cache hit for {filename}")
+            return ImageResponse(
+                panel_id=panel_id,
+                image_url=image_url,
+                status="completed",
+                seed=seed,
+                quality=quality,
+                cached=True
+            )
+
+        # 1. Token Usage Strategy: User > Server > None
+        token = hf_token or os.getenv("HUGGING_FACE_TOKEN")
+        
+        if not token:
+            print("Error: No HF Token provided (User or Server).")
+            return ImageResponse(
+                panel_id=panel_id,
+                image_url="https://via.placeholder.com/400x600?text=Missing+HF+Token",
+                status="failed"
+            )
+
+        print(f"Generating Image for Panel {panel_id} [Token Source: {'User' if hf_token else 'Server'}]")
+        print(f"  > Prompt: {image_prompt} [seed {seed}, {quality}]")
 
         # Direct HTTP usage to capture headers
-        API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
+        API_URL = f"https://api-inference.huggingface.co/models/{IMAGE_MODEL}"
         headers = {"Authorization": f"Bearer {token}"}
         payload = {
             "inputs": image_prompt, 
-            "parameters": {"negative_prompt": negative_prompt}
+            "parameters": {"negative_prompt": negative_prompt, "seed": seed, **tier_params}
         }
 
         try:
+            httpx = lazy_import("httpx")
+            # Refuse before paying for the upstream call; once paid for, the save is always accepted.
+            # Only CPU work counts against the queue, not requests waiting on Hugging Face.
+            image_pool.check_capacity()
             async with httpx.AsyncClient() as client:
                 response = await client.post(API_URL, headers=headers, json=payload, timeout=60.0)
                 
@@ -276,19 +394,17 @@ class ScriptGenerator:
                 
                 if response.status_code == 200:
                     image_bytes = response.content
-                    image = Image.open(io.BytesIO(image_bytes))
                     
-                    filename = f"panel_{panel_id}_{hash(description)}.png"
                     os.makedirs("static/images", exist_ok=True)
-                    filepath = os.path.join("static/images", filename)
-                    image.save(filepath)
-                    
-                    image_url = f"http://localhost:8000/static/images/{filename}"
+                    # Decode/encode is CPU-bound, keep it off the event loop
+                    await image_pool.run(save_png, image_bytes, filepath, admitted=True)
                     
                     return ImageResponse(
                         panel_id=panel_id,
                         image_url=image_url,
                         status="completed",
+                        seed=seed,
+                        quality=quality,
                         **stats
                     )
                 else:
@@ -311,6 +427,8 @@ class ScriptGenerator:
                          **stats
                     )
 
+        except WorkQueueFull:
+            raise
         except Exception as e:
             print(f"Error generating image: {e}")
             return ImageResponse(
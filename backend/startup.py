@@ -0,0 +1,40 @@
+import importlib
+import os
+import time
+from types import ModuleType
+from typing import Dict
+
+# Recorded as early as possible; main.py imports this module first
+BOOT_STARTED = time.perf_counter()
+
+# Heavy SDKs are imported on first use unless EAGER_IMPORTS=1 (e.g. with gunicorn preload_app)
+EAGER_IMPORTS = os.getenv("EAGER_IMPORTS", "0") == "1"
+HEAVY_MODULES = ("google.generativeai", "httpx")
+
+_modules: Dict[str, ModuleType] = {}
+_timings: Dict[str, float] = {}
+
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module on first use and record how long it took"""
+    module = _modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        _timings[f"import:{name}"] = _elapsed_ms(started)
+        _modules[name] = module
+    return module
+
+def mark(event: str):
+    """Record a boot milestone relative to process import of this module"""
+    if event not in _timings:
+        _timings[event] = _elapsed_ms(BOOT_STARTED)
+
+def preload():
+    for name in HEAVY_MODULES:
+        lazy_import(name)
+
+def report() -> dict:
+    return {"eager_imports": EAGER_IMPORTS, "timings_ms": dict(_timings)}
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from models import StyleInfo
+
+STYLES_FILE = os.getenv(
+    "STYLES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles.json")
+)
+RELOAD_CHECK_INTERVAL = 2.0  # seconds between mtime checks
+
+# Placeholders each template kind is formatted with (besides {style}, which is baked in)
+TEMPLATE_FIELDS = {
+    "panel": ("characters", "description"),
+    "character_sheet": ("name", "description", "features"),
+}
+
+# Used when STYLES_FILE can't be loaded at startup, so prompts never depend on the file existing
+DEFAULT_CONFIG = {
+    "default_style": "manga",
+    "negative_prompt": "color, realistic photo, 3d render, bad anatomy, bad hands, text, watermark, blurry, low quality, extra limbs",
+    "templates": {
+        "panel": "{style}. {characters}. {description}, monochromatic, manga page, high quality, masterpiece, 4k",
+        "character_sheet": "{style}. Character Reference Sheet for {name}. {description}. {features}. Character design, concept art, white background, high quality, consistent character details",
+    },
+    "styles": {
+        "manga": {
+            "name": "Classic Manga",
+            "desc": "Standard B&W",
+            "prompt": "manga style, black and white, japanese manga, screentones, ink illustration",
+        },
+    },
+}
+
+class StyleRegistry:
+    """Art styles and prompt templates, compiled once and hot-reloaded from STYLES_FILE"""
+
+    def __init__(self, file_path: str = STYLES_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._styles: Dict[str, StyleInfo] = {}
+        # (art_style, kind) -> template with the style prompt already baked in
+        self._compiled: Dict[tuple, str] = {}
+        self.default_style = "manga"
+        self.negative_prompt = ""
+        if not self.reload():
+            print("Using built-in default art styles")
+            self._apply(DEFAULT_CONFIG, self._mtime)
+
+    def reload(self) -> bool:
+        """Load and compile the config file. Keeps the previous registry if the file is invalid."""
+        mtime = None
+        try:
+            mtime = os.path.getmtime(self.file_path)
+            with open(self.file_path, 'r') as f:
+                config = json.load(f)
+            self._apply(config, mtime)
+        except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            print(f"Failed to load styles from {self.file_path}: {e}")
+            # Don't retry the same broken file on every check; the next edit changes the mtime
+            if mtime is not None:
+                self._mtime = mtime
+            return False
+
+        print(f"Loaded {len(self._styles)} art styles from {self.file_path}")
+        return True
+
+    def _apply(self, config: dict, mtime: Optional[float]):
+        """Validate and compile a config, then swap it in; raises without touching the registry"""
+        styles = {
+            style_id.lower(): StyleInfo(id=style_id.lower(), **sdata)
+            for style_id, sdata in config["styles"].items()
+        }
+        default_style = config.get("default_style", "manga").lower()
+        if default_style not in styles:
+            raise ValueError(f"default_style '{default_style}' is not defined")
+
+        templates = config["templates"]
+        missing = [kind for kind in TEMPLATE_FIELDS if kind not in templates]
+        if missing:
+            raise ValueError(f"missing templates: {', '.join(missing)}")
+
+        compiled = {}
+        for kind, fields in TEMPLATE_FIELDS.items():
+            for style_id, style in styles.items():
+                # Escape braces so the style text survives the later str.format()
+                style_text = style.prompt.replace("{", "{{").replace("}", "}}")
+                template = templates[kind].replace("{style}", style_text)
+                # Trial-format so a bad placeholder is rejected here, not on every request
+                try:
+                    template.format(**{field: "" for field in fields})
+                except (KeyError, IndexError, ValueError) as e:
+                    raise ValueError(f"invalid '{kind}' template for style '{style_id}': {e!r}")
+                compiled[(style_id, kind)] = template
+
+        with self._lock:
+            self._styles = styles
+            self._compiled = compiled
+            self.default_style = default_style
+            self.negative_prompt = config.get("negative_prompt", "")
+            self._mtime = mtime
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.file_path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def resolve(self, art_style: Optional[str]) -> str:
+        """Map a requested art style to a known style id, falling back to the default"""
+        self._maybe_reload()
+        style_id = (art_style or "").lower()
+        return style_id if style_id in self._styles else self.default_style
+
+    def build_prompt(self, kind: str, art_style: Optional[str], **fields: str) -> str:
+        style_id = self.resolve(art_style)
+        return self._compiled[(style_id, kind)].format(**fields)
+
+    def list_styles(self) -> List[StyleInfo]:
+        self._maybe_reload()
+        return list(self._styles.values())
+
+style_registry = StyleRegistry()
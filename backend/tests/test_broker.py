@@ -0,0 +1,60 @@
+import asyncio
+import json
+from broker import ForumBroker
+
+def parse(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(parse(subscriber.queue.get_nowait()))
+    return messages
+
+def test_publish_without_subscribers_is_noop():
+    broker = ForumBroker()
+    broker.publish("post", {"id": "p"})
+    broker.publish_like("p", 1)
+    assert broker.stats() == {"subscribers": 0, "pending_likes": 0}
+
+def test_fan_out_and_unsubscribe():
+    async def scenario():
+        broker = ForumBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish("post", {"id": "p"})
+        broker.unsubscribe(second)
+        broker.publish("comment", {"post_id": "p"})
+        return drain(first), drain(second)
+
+    first, second = asyncio.run(scenario())
+    assert first == [("post", {"id": "p"}), ("comment", {"post_id": "p"})]
+    assert second == [("post", {"id": "p"})]
+
+def test_likes_are_batched_per_interval():
+    async def scenario():
+        broker = ForumBroker(like_interval=0.01)
+        subscriber = broker.subscribe()
+        for likes in range(1, 11):
+            broker.publish_like("p", likes)
+        broker.publish_like("q", 1)
+        assert subscriber.queue.empty()
+        await asyncio.sleep(0.05)
+        return drain(subscriber)
+
+    assert asyncio.run(scenario()) == [("likes", {"p": 10, "q": 1})]
+
+def test_slow_consumer_gets_single_resync():
+    async def scenario():
+        broker = ForumBroker(queue_size=3)
+        slow, fast = broker.subscribe(), broker.subscribe()
+        for i in range(3):
+            broker.publish("comment", {"i": i})
+        drain(fast)
+        # Overflows the slow subscriber only
+        broker.publish("comment", {"i": 3})
+        return drain(slow), drain(fast)
+
+    slow, fast = asyncio.run(scenario())
+    assert slow == [("resync", {"dropped": 3})]
+    assert fast == [("comment", {"i": 3})]
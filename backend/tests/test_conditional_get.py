@@ -0,0 +1,66 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+PROJECT = {
+    "id": "",
+    "title": "T",
+    "created_at": "",
+    "updated_at": "",
+    "images": {},
+    "art_style": "manga",
+    "script": {"title": "T", "panels": [{"id": 1, "description": "a", "characters": []}], "characters": []},
+}
+POST = {"title": "Hi", "content": "x", "author": "aj"}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # JSON stores and the search index live in the working directory
+    monkeypatch.chdir(tmp_path)
+    for getter in (main.get_search_index, main.get_library, main.get_forum):
+        getter.cache_clear()
+    yield TestClient(main.app)
+    for getter in (main.get_search_index, main.get_library, main.get_forum):
+        getter.cache_clear()
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+def test_matching_etag_gives_304(client):
+    first = client.get("/projects")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = revalidate(client, "/projects", etag)
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+
+def test_save_project_invalidates(client):
+    etag = client.get("/projects").headers["etag"]
+    client.post("/projects", json=PROJECT)
+
+    response = revalidate(client, "/projects", etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()) == 1
+
+def test_forum_writes_invalidate(client):
+    etag = client.get("/forum/posts").headers["etag"]
+    post_id = client.post("/forum/posts", json=POST).json()["id"]
+    response = revalidate(client, "/forum/posts", etag)
+    assert response.status_code == 200
+
+    etag = response.headers["etag"]
+    assert revalidate(client, "/forum/posts", etag).status_code == 304
+    client.post(f"/forum/posts/{post_id}/like")
+    response = revalidate(client, "/forum/posts", etag)
+    assert response.status_code == 200
+    assert response.json()[0]["likes"] == 1
+
+def test_wildcard_and_tag_lists(client):
+    etag = client.get("/projects").headers["etag"]
+
+    assert client.get("/projects", headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get("/projects", headers={"If-None-Match": f'W/"other", {etag}'}).status_code == 304
+    assert client.get("/projects", headers={"If-None-Match": 'W/"other", W/"stale"'}).status_code == 200
@@ -0,0 +1,84 @@
+import asyncio
+import io
+import types
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+import main
+import services
+from models import ImageResponse
+from workers import CPUWorkPool
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("L", (4, 4)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    content = png_bytes()
+
+def fake_httpx(calls):
+    class AsyncClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def post(self, url, headers, json, timeout):
+            calls.append(json)
+            return FakeResponse()
+
+    return types.SimpleNamespace(AsyncClient=AsyncClient)
+
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    """Run image generation in tmp_path against a fake Hugging Face endpoint"""
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(services, "lazy_import", lambda name: fake_httpx(calls))
+    monkeypatch.setattr(services, "image_pool", CPUWorkPool(workers=0))
+    return calls
+
+def test_same_request_hits_image_cache(offline):
+    async def generate():
+        return await services.script_generator.generate_image(
+            1, "a duel at dawn", "preview", "manga", "key", {"Kage": "red scarf"}, ["Kage"], "hf", 42
+        )
+
+    first = asyncio.run(generate())
+    second = asyncio.run(generate())
+
+    assert len(offline) == 1
+    assert (first.status, first.cached, first.seed) == ("completed", False, 42)
+    assert (second.cached, second.image_url) == (True, first.image_url)
+
+def test_new_variant_of_unsaved_project_gets_random_seed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for getter in (main.get_search_index, main.get_library, main.get_forum):
+        getter.cache_clear()
+    seeds = []
+
+    async def fake_generate_image(*args):
+        seeds.append(args[-1])
+        return ImageResponse(panel_id=args[0], image_url="/x.png", status="completed", seed=args[-1])
+
+    monkeypatch.setattr(main.script_generator, "generate_image", fake_generate_image)
+    client = TestClient(main.app)
+    body = {
+        "panel_id": 1,
+        "description": "a duel",
+        "characters": [],
+        "style": "preview",
+        "project_id": "unsaved",
+        "new_variant": True,
+    }
+    for _ in range(2):
+        assert client.post("/generate/image", json=body, headers={"x-gemini-api-key": "k"}).status_code == 200
+
+    assert None not in seeds
+    assert seeds[0] != seeds[1]
+    for getter in (main.get_search_index, main.get_library, main.get_forum):
+        getter.cache_clear()
@@ -0,0 +1,74 @@
+import pytest
+from json_repair import repair_json, salvage
+from models import Panel, CharacterProfile
+
+def test_valid_json_with_code_fences():
+    assert repair_json('```json\n{"title": "T"}\n```') == ({"title": "T"}, False)
+
+def test_trailing_commas_are_dropped():
+    data, truncated = repair_json('{"panels": [1, 2, ], "title": "T", }')
+    assert data == {"panels": [1, 2], "title": "T"}
+    assert not truncated
+
+def test_prose_around_object():
+    data, truncated = repair_json('Sure! Here is your script: {"title": "T"} Enjoy!')
+    assert data == {"title": "T"}
+    assert not truncated
+
+def test_brackets_in_leading_prose():
+    assert repair_json('Here [note] {"a": 1}') == ({"a": 1}, False)
+
+def test_truncated_array_keeps_complete_items():
+    text = (
+        '{"title": "T", "panels": ['
+        '{"id": 1, "description": "a", "characters": ["Kage"]},'
+        '{"id": 2, "description": "b", "characters": []},'
+        '{"id": 3, "descr'
+    )
+    data, truncated = repair_json(text)
+    assert truncated
+    assert data["title"] == "T"
+    assert [p.id for p in salvage(data["panels"], Panel)] == [1, 2]
+
+def test_truncated_inside_string_with_commas_and_escapes():
+    data, truncated = repair_json('{"t": "a, b", "p": [{"x": "he said \\"hi, there\\""}, {"x": "cut')
+    assert truncated
+    assert data == {"t": "a, b", "p": [{"x": 'he said "hi, there"'}]}
+
+def test_missing_comma_between_panels_keeps_the_document():
+    text = (
+        '{"title": "T", "panels": ['
+        '{"id": 1, "description": "a", "characters": []} '
+        '{"id": 2, "description": "b", "characters": []}'
+        ']}'
+    )
+    data, truncated = repair_json(text)
+    assert truncated
+    assert data["title"] == "T"
+    assert [p.id for p in salvage(data["panels"], Panel)] == [1]
+
+def test_unescaped_quote_in_later_panel_keeps_earlier_panels():
+    text = (
+        '{"title": "T", "panels": ['
+        '{"id": 1, "description": "a", "characters": []},'
+        '{"id": 2, "description": "b", "characters": []},'
+        '{"id": 3, "description": "He yells "run" and flees", "characters": []}'
+        ']}'
+    )
+    data, truncated = repair_json(text)
+    assert truncated
+    assert data["title"] == "T"
+    assert [p.id for p in salvage(data["panels"], Panel)] == [1, 2]
+
+def test_no_json_raises_value_error():
+    with pytest.raises(ValueError):
+        repair_json("I could not write that story.")
+
+def test_salvage_skips_invalid_items():
+    items = [
+        {"name": "A", "description": "d", "personality": "p", "appearance": "x"},
+        {"name": "B"},
+        "not a dict",
+    ]
+    assert [c.name for c in salvage(items, CharacterProfile)] == ["A"]
+    assert salvage(None, CharacterProfile) == []
@@ -0,0 +1,76 @@
+import pytest
+import library
+from library import ProjectManager
+from models import Project, ScriptResponse, Panel, CharacterProfile
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(library, "PROJECTS_FILE", str(tmp_path / "projects.json"))
+    return ProjectManager()
+
+def make_project(characters=(("Kage", "black hair, red scarf"),), **kwargs):
+    return Project(
+        id="",
+        title="T",
+        created_at="",
+        updated_at="",
+        script=ScriptResponse(
+            title="T",
+            panels=[Panel(id=1, description="a duel", characters=[name for name, _ in characters])],
+            characters=[
+                CharacterProfile(name=name, description="d", personality="p", appearance=appearance)
+                for name, appearance in characters
+            ],
+        ),
+        images={},
+        art_style="manga",
+        **kwargs,
+    )
+
+def test_descriptors_fall_back_to_saved_script(manager):
+    project_id = manager.save_project(make_project())
+    assert manager.get_character_descriptors(project_id) == {"Kage": "black hair, red scarf"}
+
+def test_request_profiles_override_saved_script(manager):
+    project_id = manager.save_project(make_project())
+    descriptors = manager.get_character_descriptors(project_id, {"Kage": "silver hair, blue coat"})
+    assert descriptors == {"Kage": "silver hair, blue coat"}
+
+def test_removed_characters_are_not_returned(manager):
+    project_id = manager.save_project(make_project((("Kage", "black hair"), ("Rin", "short bob"))))
+    manager.get_character_descriptors(project_id)
+
+    descriptors = manager.get_character_descriptors(project_id, {"Kage": "black hair"})
+    assert descriptors == {"Kage": "black hair"}
+    # The asset itself is kept, e.g. for its character sheet
+    assert {a.name for a in manager.get_character_assets(project_id)} == {"Kage", "Rin"}
+
+def test_unknown_project_has_no_descriptors(manager):
+    assert manager.get_character_descriptors("missing", {"Kage": "x"}) == {}
+
+def test_save_without_seed_keeps_stored_seed(manager):
+    project_id = manager.save_project(make_project())
+    seed = manager.get_project(project_id).seed
+    assert seed is not None
+
+    # The client saves the project it loaded earlier, without the server-side fields
+    project = manager.get_project(project_id)
+    project.seed = None
+    manager.save_project(project)
+    assert manager.get_project(project_id).seed == seed
+    assert manager.get_seed(project_id, 1) == seed
+
+def test_new_variant_stores_a_panel_seed(manager, monkeypatch):
+    project_id = manager.save_project(make_project())
+    seed = manager.get_project(project_id).seed
+    monkeypatch.setattr(library, "new_seed", lambda: seed + 1)
+
+    variant = manager.get_seed(project_id, 1, new_variant=True)
+    assert variant == seed + 1
+    assert manager.get_project(project_id).panel_seeds == {"1": variant}
+    assert manager.get_seed(project_id, 1) == variant
+    # Other panels keep the project seed
+    assert manager.get_seed(project_id, 2) == seed
+
+def test_unsaved_project_has_no_seed(manager):
+    assert manager.get_seed("missing", 1, new_variant=True) is None
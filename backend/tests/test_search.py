@@ -0,0 +1,106 @@
+import pytest
+from search import SearchIndex
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "search.db"))
+
+def make_project(project_id, title, description="", characters=()):
+    return {
+        "id": project_id,
+        "updated_at": "2025-01-01T00:00:00",
+        "script": {
+            "title": title,
+            "panels": [{"id": 1, "description": description, "dialogue": None, "characters": list(characters)}],
+            "characters": [],
+        },
+    }
+
+def make_post(post_id, title, content, comments=()):
+    return {
+        "id": post_id,
+        "title": title,
+        "content": content,
+        "author": "aj",
+        "created_at": "2025-01-01T00:00:00",
+        "comments": [{"content": c, "author": "me"} for c in comments],
+    }
+
+def test_empty_index(index):
+    assert index.is_empty()
+    assert index.search("anything") == (0, [])
+
+def test_project_and_post_are_searchable(index):
+    index.index_project(make_project("p1", "Shadow Weaver", "A village at dawn", ["Kage"]))
+    index.index_post(make_post("f1", "My first work", "blade story"))
+
+    total, results = index.search("kage")
+    assert total == 1
+    assert (results[0].kind, results[0].id) == ("project", "p1")
+
+    total, results = index.search("blade")
+    assert (results[0].kind, results[0].id) == ("post", "f1")
+
+def test_prefix_match_on_last_term(index):
+    index.index_project(make_project("p1", "Shadow Weaver"))
+    assert index.search("shad")[0] == 1
+    # Single characters are not expanded as prefixes
+    assert index.search("s")[0] == 0
+
+def test_upsert_replaces_document(index):
+    index.index_post(make_post("f1", "Old title", "nothing"))
+    index.index_post(make_post("f1", "New title", "nothing", comments=["great ninja"]))
+
+    assert index.search("old")[0] == 0
+    total, results = index.search("ninja")
+    assert total == 1
+    assert results[0].title == "New title"
+
+def test_remove(index):
+    index.index_project(make_project("p1", "Shadow Weaver"))
+    index.index_post(make_post("f1", "Shadow talk", "x"))
+    index.remove_project("p1")
+
+    total, results = index.search("shadow")
+    assert total == 1
+    assert results[0].kind == "post"
+    index.remove_post("missing")  # no-op
+
+def test_kind_filter(index):
+    index.index_project(make_project("p1", "Shadow Weaver"))
+    index.index_post(make_post("f1", "Shadow talk", "x"))
+
+    assert [r.id for r in index.search("shadow", kind="post")[1]] == ["f1"]
+    assert [r.id for r in index.search("shadow", kind="project")[1]] == ["p1"]
+
+def test_terms_do_not_match_the_kind_column(index):
+    index.index_project(make_project("p1", "Shadow Weaver"))
+    index.index_post(make_post("f1", "Shadow talk", "x"))
+    index.index_post(make_post("f2", "Portal story", "x"))
+
+    assert index.search("post") == (0, [])
+    assert index.search("proj") == (0, [])
+    assert [r.id for r in index.search("po")[1]] == ["f2"]
+    assert [r.id for r in index.search("po", kind="post")[1]] == ["f2"]
+
+def test_pagination(index):
+    for i in range(25):
+        index.index_post(make_post(f"f{i}", f"Ninja story {i}", "x"))
+
+    total, first = index.search("ninja", page=1, page_size=10)
+    _, last = index.search("ninja", page=3, page_size=10)
+    assert total == 25
+    assert len(first) == 10
+    assert len(last) == 5
+    ids = {r.id for r in first} | {r.id for r in index.search("ninja", page=2, page_size=10)[1]} | {r.id for r in last}
+    assert len(ids) == 25
+
+def test_title_ranks_above_body(index):
+    index.index_post(make_post("body", "Unrelated", "a dragon appears"))
+    index.index_post(make_post("title", "Dragon", "something else"))
+    assert index.search("dragon")[1][0].id == "title"
+
+def test_query_syntax_is_escaped(index):
+    index.index_post(make_post("f1", "Quotes", 'he said "hi"'))
+    assert index.search('"hi" AND (NOT')[0] == 0
+    assert index.search('hi"')[0] == 1
@@ -0,0 +1,24 @@
+import json
+from styles import StyleRegistry, style_registry
+
+def test_default_file_is_found_regardless_of_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert "shonen" in {s.id for s in StyleRegistry().list_styles()}
+
+def test_missing_file_falls_back_to_builtin_styles(tmp_path):
+    registry = StyleRegistry(str(tmp_path / "missing.json"))
+    prompt = registry.build_prompt("panel", "shonen", characters="Kage", description="a duel")
+    assert prompt.startswith("manga style")
+    assert registry.build_prompt("character_sheet", None, name="Kage", description="d", features="f")
+
+def test_invalid_reload_keeps_previous_registry(tmp_path):
+    path = tmp_path / "styles.json"
+    with open(style_registry.file_path) as f:
+        path.write_text(f.read())
+    registry = StyleRegistry(str(path))
+
+    config = json.loads(path.read_text())
+    config["templates"]["panel"] = "{style}. {unknown}"
+    path.write_text(json.dumps(config))
+    assert not registry.reload()
+    assert "shonen" in registry.build_prompt("panel", "shonen", characters="", description="")
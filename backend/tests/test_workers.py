@@ -0,0 +1,32 @@
+import asyncio
+import threading
+import pytest
+from workers import CPUWorkPool, WorkQueueFull
+
+def test_run_returns_result():
+    pool = CPUWorkPool(workers=0, queue_size=0)
+    assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    assert pool.stats()["active"] == 0
+
+def test_full_queue_rejects_unless_admitted():
+    async def scenario():
+        pool = CPUWorkPool(workers=0, queue_size=1)
+        release = threading.Event()
+        jobs = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        stats = pool.stats()
+
+        with pytest.raises(WorkQueueFull):
+            pool.check_capacity()
+        with pytest.raises(WorkQueueFull):
+            await pool.run(pow, 2, 2)
+        # A job whose capacity was checked before an upstream call is still accepted
+        admitted = asyncio.create_task(pool.run(pow, 2, 3, admitted=True))
+        release.set()
+        await asyncio.gather(*jobs)
+        return stats, await admitted, pool.stats()
+
+    stats, result, after = asyncio.run(scenario())
+    assert (stats["active"], stats["queued"]) == (1, 1)
+    assert result == 8
+    assert (after["active"], after["queued"]) == (0, 0)
@@ -0,0 +1,103 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+# 0 workers runs jobs on the default thread pool instead (no extra processes on tiny hosts)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "1"))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "8"))
+
+class WorkQueueFull(Exception):
+    """Raised when the CPU work queue is at capacity; callers should back off and retry"""
+
+# --- Jobs (module level so they can be pickled into worker processes) ---
+
+def save_png(image_bytes: bytes, filepath: str) -> int:
+    """Decode, verify and re-encode upstream image bytes as PNG. Returns the file size."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as probe:
+        probe.verify()
+    # verify() leaves the image unusable, so decode again for the actual save
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.save(filepath, format="PNG")
+    return os.path.getsize(filepath)
+
+class CPUWorkPool:
+    """Runs CPU-bound image work off the event loop with a bounded queue"""
+
+    def __init__(self, workers: int = IMAGE_WORKERS, queue_size: int = IMAGE_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._active = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        # Created lazily so importing this module never forks
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def is_full(self) -> bool:
+        return self._pending >= self.capacity
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": self._active,
+            "queued": self._pending - self._active,
+            "capacity": self.capacity,
+        }
+
+    def check_capacity(self):
+        """Raise WorkQueueFull when at capacity; call it before paying for work that run() will receive"""
+        if self.is_full():
+            raise WorkQueueFull(f"Image work queue is full ({self.capacity} jobs pending)")
+
+    async def run(self, fn: Callable, *args, admitted: bool = False):
+        """Run fn(*args) off the event loop. Pass admitted=True when check_capacity() already passed
+        for this job; it is then always accepted, so a paid-for upstream result is never discarded."""
+        if not admitted:
+            self.check_capacity()
+        self._pending += 1
+        try:
+            return await self._execute(fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def _execute(self, fn: Callable, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(self.workers, 1))
+
+        async with self._slots:
+            self._active += 1
+            try:
+                executor = self._get_executor()
+                if executor is None:
+                    return await asyncio.to_thread(fn, *args)
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed); replace the pool and retry once
+                    print("Image worker pool broke, restarting it")
+                    if self._executor is executor:
+                        self.shutdown()
+                    return await loop.run_in_executor(self._get_executor(), fn, *args)
+            finally:
+                self._active -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+image_pool = CPUWorkPool()